@@ -7,23 +7,35 @@ CodeB v7.0 - Bash Command Validator (Admin Mode)
 - 시스템 파괴 명령만 차단
 """
 
-import sys
+import functools
 import json
+import os
+import sys
 import re
-from pathlib import Path
-from datetime import datetime
+import time
+import types
+
+def _dumps(obj):
+    """JSON 인코딩 (bytes 반환 - stdout.buffer 에 바로 쓴다)"""
+    return json.dumps(obj).encode()
 
 # ============================================================================
 # 설정
 # ============================================================================
 
-CONFIG = {
-    # 감사 로그 경로
-    "audit_log_path": Path.home() / ".codeb" / "hook-audit.log",
-}
+@functools.lru_cache(maxsize=None)
+def _paths():
+    """경로 설정 - 처음 필요할 때 한 번만 계산 (허용 경로에서는 호출되지 않음)"""
+    codeb_dir = os.path.join(os.path.expanduser("~"), ".codeb")
+    return types.SimpleNamespace(
+        codeb_dir=codeb_dir,
+        # 감사 로그 경로
+        audit=os.path.join(codeb_dir, "hook-audit.log"),
+    )
 
 # ============================================================================
 # 절대 금지 패턴 (DB 보호 + 시스템 파괴만)
+# 패턴은 소문자로 작성 - 소문자로 변환한 명령에 IGNORECASE 없이 매칭
 # ============================================================================
 
 FORBIDDEN_PATTERNS = [
@@ -34,10 +46,10 @@ FORBIDDEN_PATTERNS = [
     (r"docker\s+volume\s+(rm|remove)\s+.*redis", "🛑 Redis 볼륨 삭제 절대 금지"),
     (r"rm\s+(-rf|-fr).*postgres.*data", "🛑 PostgreSQL 데이터 삭제 절대 금지"),
     (r"rm\s+(-rf|-fr).*redis.*data", "🛑 Redis 데이터 삭제 절대 금지"),
-    (r"DROP\s+DATABASE", "🛑 DROP DATABASE 절대 금지"),
+    (r"drop\s+database", "🛑 DROP DATABASE 절대 금지"),
     (r"dropdb\s+", "🛑 dropdb 명령 절대 금지"),
-    (r"FLUSHALL", "🛑 Redis FLUSHALL 절대 금지"),
-    (r"FLUSHDB", "🛑 Redis FLUSHDB 절대 금지"),
+    (r"flushall", "🛑 Redis FLUSHALL 절대 금지"),
+    (r"flushdb", "🛑 Redis FLUSHDB 절대 금지"),
 
     # === 시스템 파괴 방지 ===
     (r"rm\s+(-rf|-fr)\s+/\s*$", "루트 디렉토리 삭제 금지"),
@@ -48,20 +60,33 @@ FORBIDDEN_PATTERNS = [
     (r"dd\s+if=.*of=/dev/", "디스크 직접 쓰기 금지"),
 ]
 
+# 모든 패턴을 named group alternation 하나로 합쳐 모듈 로드 시 한 번만 컴파일
+# (패턴 수만큼 search 하지 않고 한 번의 탐색으로 판정, g<i> → 메시지 인덱스)
+# 메시지는 (원문, JSON 인코딩된 bytes) 로 미리 만들어 deny 시 인코딩 생략
+_FORBIDDEN_MESSAGES = [(message, _dumps(message)) for _, message in FORBIDDEN_PATTERNS]
+_FORBIDDEN_COMBINED = re.compile(
+    "|".join(f"(?P<g{i}>{pattern})" for i, (pattern, _) in enumerate(FORBIDDEN_PATTERNS))
+)
+
+# 금지 패턴이 매칭되려면 반드시 포함되어야 하는 토큰 (소문자)
+# 하나도 없으면 정규식 검사 없이 바로 허용
+_TRIGGER_TOKENS = ("docker", "rm", "drop", "flush", "mkfs", "dd")
+
 # ============================================================================
 # JSON 응답 헬퍼
 # ============================================================================
 
-def deny(reason):
-    """명령 거부"""
-    output = {
-        "hookSpecificOutput": {
-            "hookEventName": "PreToolUse",
-            "permissionDecision": "deny",
-            "permissionDecisionReason": reason
-        }
-    }
-    print(json.dumps(output))
+# 응답 envelope 은 고정 - reason 만 JSON 문자열로 인코딩해 끼워 넣는다
+_DENY_TMPL = (
+    b'{"hookSpecificOutput":{"hookEventName":"PreToolUse",'
+    b'"permissionDecision":"deny","permissionDecisionReason":%b}}\n'
+)
+
+def deny(reason, reason_json=None):
+    """명령 거부 (reason_json: 미리 JSON 인코딩된 reason, 없으면 여기서 인코딩)"""
+    if reason_json is None:
+        reason_json = _dumps(reason)
+    sys.stdout.buffer.write(_DENY_TMPL % reason_json)
     audit_log("DENIED", reason)
     sys.exit(0)
 
@@ -73,20 +98,34 @@ def allow():
 # 감사 로그
 # ============================================================================
 
+_AUDIT_DIR_OK = False
+
 def audit_log(action, message, command=""):
-    """감사 로그 기록"""
+    """감사 로그 기록 (CODEB_HOOK_AUDIT=0 이면 비활성화)
+
+    O_APPEND + 단일 write() 로 기록 - PIPE_BUF 이하 한 줄은 동시 실행되는
+    hook 끼리도 섞이지 않는다.
+    """
+    global _AUDIT_DIR_OK
+    if os.environ.get("CODEB_HOOK_AUDIT") == "0":
+        return
     try:
-        log_path = CONFIG["audit_log_path"]
-        log_path.parent.mkdir(parents=True, exist_ok=True)
+        paths = _paths()
+        if not _AUDIT_DIR_OK:
+            os.makedirs(paths.codeb_dir, exist_ok=True)
+            _AUDIT_DIR_OK = True
 
-        timestamp = datetime.now().isoformat()
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
         log_entry = f"[{timestamp}] {action}: {message}"
         if command:
             log_entry += f" | Command: {command[:100]}"
         log_entry += "\n"
 
-        with open(log_path, "a") as f:
-            f.write(log_entry)
+        fd = os.open(paths.audit, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, log_entry.encode())
+        finally:
+            os.close(fd)
     except Exception:
         pass
 
@@ -94,12 +133,19 @@ def audit_log(action, message, command=""):
 # 검증 함수
 # ============================================================================
 
-def check_forbidden(command):
-    """금지 패턴 체크"""
-    for pattern, message in FORBIDDEN_PATTERNS:
-        if re.search(pattern, command, re.IGNORECASE):
-            return True, message
-    return False, None
+def has_trigger_token(command_lower):
+    """금지 패턴 관련 토큰이 하나라도 포함되어 있는지 (부분 문자열 검사)"""
+    return any(token in command_lower for token in _TRIGGER_TOKENS)
+
+def check_forbidden(command_lower):
+    """금지 패턴 체크 (소문자로 변환된 명령을 받는다)
+
+    매칭 시 (message, message_json), 아니면 None 반환
+    """
+    match = _FORBIDDEN_COMBINED.search(command_lower)
+    if match:
+        return _FORBIDDEN_MESSAGES[int(match.lastgroup[1:])]
+    return None
 
 # ============================================================================
 # 메인
@@ -108,12 +154,13 @@ def check_forbidden(command):
 def main():
     # stdin에서 hook input 읽기
     try:
-        input_data = sys.stdin.read()
+        # bytes 그대로 파싱 (텍스트 디코딩 단계 생략)
+        input_data = sys.stdin.buffer.read()
         if input_data.strip():
             hook_input = json.loads(input_data)
         else:
             hook_input = {}
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, UnicodeDecodeError):
         hook_input = {}
 
     # Bash 도구의 command 파라미터 추출
@@ -123,10 +170,15 @@ def main():
     if not command:
         allow()
 
+    # 위험 토큰이 없는 일반 명령 (ls, cat, git status ...) 은 바로 허용
+    command_lower = command.lower()
+    if not has_trigger_token(command_lower):
+        allow()
+
     # 금지 패턴만 체크 (DB 보호 + 시스템 파괴)
-    is_forbidden, forbidden_reason = check_forbidden(command)
-    if is_forbidden:
-        deny(forbidden_reason)
+    forbidden = check_forbidden(command_lower)
+    if forbidden:
+        deny(*forbidden)
 
     # 나머지는 모두 허용 (어드민 모드)
     allow()
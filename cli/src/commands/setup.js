@@ -139,8 +139,9 @@ import sys
 import json
 import re
 import os
+import time
+import functools
 from pathlib import Path
-from datetime import datetime, timedelta
 
 # ============================================================================
 # 설정
@@ -174,94 +175,119 @@ DEFAULT_ALLOWED_HOSTNAMES = [
 # ============================================================================
 
 def load_ssot_cache():
-    """SSOT 캐시 로드 (만료 체크 포함)"""
-    try:
-        if not SSOT_CACHE_PATH.exists():
-            return None
-
-        with open(SSOT_CACHE_PATH, 'r') as f:
-            cache = json.load(f)
+    """SSOT 캐시 로드 (만료 체크 포함)
 
-        # 만료 체크
-        cached_at = cache.get('cachedAt', '')
-        if cached_at:
-            cached_time = datetime.fromisoformat(cached_at.replace('Z', '+00:00'))
-            if datetime.now(cached_time.tzinfo) - cached_time > timedelta(minutes=CACHE_TTL_MINUTES):
-                return None  # 캐시 만료
+    캐시는 동기화할 때마다 통째로 다시 쓰므로 파일 mtime 을 cachedAt 대신 사용
+    """
+    try:
+        st = os.stat(SSOT_CACHE_PATH)
+        if time.time() - st.st_mtime > CACHE_TTL_MINUTES * 60:
+            return None  # 캐시 만료
 
-        return cache
+        with open(SSOT_CACHE_PATH, 'rb') as f:
+            return json.load(f)
     except Exception:
         return None
 
+@functools.lru_cache(maxsize=1)
 def get_allowed_servers():
     """허용된 서버 목록 가져오기 (SSOT 캐시 우선)"""
     cache = load_ssot_cache()
 
     if cache and 'servers' in cache:
         return (
-            cache['servers'].get('ips', DEFAULT_ALLOWED_IPS),
-            cache['servers'].get('hostnames', DEFAULT_ALLOWED_HOSTNAMES)
+            frozenset(cache['servers'].get('ips', DEFAULT_ALLOWED_IPS)),
+            frozenset(cache['servers'].get('hostnames', DEFAULT_ALLOWED_HOSTNAMES))
         )
 
-    return DEFAULT_ALLOWED_IPS, DEFAULT_ALLOWED_HOSTNAMES
+    return frozenset(DEFAULT_ALLOWED_IPS), frozenset(DEFAULT_ALLOWED_HOSTNAMES)
 
 # ============================================================================
 # 검증 규칙
 # ============================================================================
 
-# 절대 금지 명령어 패턴
+# 절대 금지 명령어 패턴 (소문자로 변환한 명령에 매칭 - 모듈 로드 시 한 번만 컴파일)
 FORBIDDEN_PATTERNS = [
     # 컨테이너 강제 삭제
-    (r'podman\\s+rm\\s+(-f|--force)', "직접 컨테이너 삭제 금지. 사용: we workflow stop <project>"),
-    (r'docker\\s+rm\\s+(-f|--force)', "직접 컨테이너 삭제 금지. 사용: we workflow stop <project>"),
+    (re.compile(r'podman\\s+rm\\s+(-f|--force)'), "직접 컨테이너 삭제 금지. 사용: we workflow stop <project>"),
+    (re.compile(r'docker\\s+rm\\s+(-f|--force)'), "직접 컨테이너 삭제 금지. 사용: we workflow stop <project>"),
 
     # 볼륨 삭제
-    (r'podman\\s+volume\\s+rm', "직접 볼륨 삭제 금지. 사용: we workflow cleanup <project>"),
-    (r'docker\\s+volume\\s+rm', "직접 볼륨 삭제 금지. 사용: we workflow cleanup <project>"),
+    (re.compile(r'podman\\s+volume\\s+rm'), "직접 볼륨 삭제 금지. 사용: we workflow cleanup <project>"),
+    (re.compile(r'docker\\s+volume\\s+rm'), "직접 볼륨 삭제 금지. 사용: we workflow cleanup <project>"),
 
     # docker-compose down -v
-    (r'docker-compose\\s+down\\s+.*-v', "볼륨 포함 삭제 금지. 사용: we workflow stop <project>"),
-    (r'podman-compose\\s+down\\s+.*-v', "볼륨 포함 삭제 금지. 사용: we workflow stop <project>"),
+    (re.compile(r'docker-compose\\s+down\\s+.*-v'), "볼륨 포함 삭제 금지. 사용: we workflow stop <project>"),
+    (re.compile(r'podman-compose\\s+down\\s+.*-v'), "볼륨 포함 삭제 금지. 사용: we workflow stop <project>"),
 
     # 프로젝트 폴더 삭제
-    (r'rm\\s+(-rf|-fr|--recursive)\\s+.*(/opt/codeb|codeb)', "CodeB 폴더 직접 삭제 금지"),
+    (re.compile(r'rm\\s+(-rf|-fr|--recursive)\\s+.*(/opt/codeb|codeb)'), "CodeB 폴더 직접 삭제 금지"),
 
     # systemctl stop (서비스 중지)
-    (r'systemctl\\s+stop\\s+.*codeb', "서비스 직접 중지 금지. 사용: we workflow stop <project>"),
+    (re.compile(r'systemctl\\s+stop\\s+.*codeb'), "서비스 직접 중지 금지. 사용: we workflow stop <project>"),
 
     # 위험한 prune 명령
-    (r'podman\\s+(system|volume)\\s+prune\\s+(-a|--all)', "전체 정리 금지. 프로젝트별로 정리하세요."),
-    (r'docker\\s+(system|volume)\\s+prune\\s+(-a|--all)', "전체 정리 금지. 프로젝트별로 정리하세요."),
+    (re.compile(r'podman\\s+(system|volume)\\s+prune\\s+(-a|--all)'), "전체 정리 금지. 프로젝트별로 정리하세요."),
+    (re.compile(r'docker\\s+(system|volume)\\s+prune\\s+(-a|--all)'), "전체 정리 금지. 프로젝트별로 정리하세요."),
+]
+
+# (패턴, 거부 사유, JSON 인코딩된 거부 사유) - deny 시 포맷/인코딩 생략
+FORBIDDEN_RULES = [
+    (pattern, f"🚫 {message}", json.dumps(f"🚫 {message}").encode())
+    for pattern, message in FORBIDDEN_PATTERNS
 ]
 
-# 허용 패턴 (조회 명령) - 항상 허용
+# SSH 대상 검증이 필요한 명령어 (아래 SSH/SCP/RSYNC 패턴이 모두 이 중 하나를 포함)
+SSH_COMMAND_TOKENS = ('ssh', 'scp', 'rsync')
+
+# ssh 접속 대상 (ip: IP 주소, host: 호스트명 - 공백/따옴표/문자열 끝에서 끝남)
+# lookahead 로 감싸 finditer 가 겹치는 위치의 ssh 도 모두 검사
+# (예: rsync -e 'ssh evil.com' ... 안의 ssh 대상)
+SSH_TARGET_PATTERN = re.compile(
+    r'(?=ssh\\s+(?:-[^\\s]+\\s+)*(?:\\w+@)?'
+    r'(?:(?P<ip>\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3})|(?P<host>[\\w\\-\\.]+)(?=[\\s\\'"]|$)))'
+)
+# scp/rsync 는 첫 scp/rsync 토큰 이후의 모든 IP 주소를 검사
+FILE_COPY_PATTERN = re.compile(r'(?:scp|rsync)\\s')
+IPV4_SEARCH_PATTERN = re.compile(r'\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}')
+IPV4_PATTERN = re.compile(r'^\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}$')
+
+# 컨테이너 조작 명령 (rm/stop/restart/kill) - 옵션(-f 등)은 건너뛰고 컨테이너 이름 캡처
+CONTAINER_OP_PATTERN = re.compile(r'(?:podman|docker)\\s+(?:rm|stop|restart|kill)\\s+(?:-\\S+\\s+)*(\\S+)')
+
+# 허용 패턴 (조회 명령) - 항상 허용 (모듈 로드 시 한 번만 컴파일)
 ALLOWED_PATTERNS = [
-    r'^we\\s+',           # we CLI 명령
-    r'podman\\s+ps',
-    r'podman\\s+logs',
-    r'podman\\s+inspect',
-    r'podman\\s+images',
-    r'podman\\s+volume\\s+ls',
-    r'podman\\s+network\\s+ls',
-    r'docker\\s+ps',
-    r'docker\\s+logs',
-    r'docker\\s+inspect',
+    re.compile(r'^we\\s+', re.IGNORECASE),  # we CLI 명령
+    re.compile(r'podman\\s+ps', re.IGNORECASE),
+    re.compile(r'podman\\s+logs', re.IGNORECASE),
+    re.compile(r'podman\\s+inspect', re.IGNORECASE),
+    re.compile(r'podman\\s+images', re.IGNORECASE),
+    re.compile(r'podman\\s+volume\\s+ls', re.IGNORECASE),
+    re.compile(r'podman\\s+network\\s+ls', re.IGNORECASE),
+    re.compile(r'docker\\s+ps', re.IGNORECASE),
+    re.compile(r'docker\\s+logs', re.IGNORECASE),
+    re.compile(r'docker\\s+inspect', re.IGNORECASE),
 ]
 
 # ============================================================================
 # JSON 응답 헬퍼
 # ============================================================================
 
-def deny(reason: str):
-    """명령 거부 (JSON 출력)"""
-    output = {
-        "hookSpecificOutput": {
-            "hookEventName": "PreToolUse",
-            "permissionDecision": "deny",
-            "permissionDecisionReason": reason
-        }
-    }
-    print(json.dumps(output))
+# 응답 envelope 은 고정 - reason 만 JSON 문자열로 인코딩해 끼워 넣는다
+DENY_TEMPLATE = (
+    b'{"hookSpecificOutput": {"hookEventName": "PreToolUse", '
+    b'"permissionDecision": "deny", "permissionDecisionReason": %b}}\\n'
+)
+ASK_TEMPLATE = (
+    b'{"hookSpecificOutput": {"hookEventName": "PreToolUse", '
+    b'"permissionDecision": "ask", "permissionDecisionReason": %b}}\\n'
+)
+
+def deny(reason: str, reason_json: bytes = None):
+    """명령 거부 (JSON 출력, reason_json: 미리 인코딩된 reason)"""
+    if reason_json is None:
+        reason_json = json.dumps(reason).encode()
+    sys.stdout.buffer.write(DENY_TEMPLATE % reason_json)
     sys.exit(0)
 
 def allow():
@@ -270,14 +296,7 @@ def allow():
 
 def ask(reason: str):
     """사용자 확인 요청"""
-    output = {
-        "hookSpecificOutput": {
-            "hookEventName": "PreToolUse",
-            "permissionDecision": "ask",
-            "permissionDecisionReason": reason
-        }
-    }
-    print(json.dumps(output))
+    sys.stdout.buffer.write(ASK_TEMPLATE % json.dumps(reason).encode())
     sys.exit(0)
 
 # ============================================================================
@@ -288,42 +307,36 @@ def check_ssh_target(command: str):
     """SSH 접속 대상 서버 검증"""
     allowed_ips, allowed_hostnames = get_allowed_servers()
 
-    # SSH/SCP/RSYNC 명령어 패턴
-    ssh_patterns = [
-        r'ssh\\s+(?:-[^\\s]+\\s+)*(?:(\\w+)@)?(\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3})',
-        r'ssh\\s+(?:-[^\\s]+\\s+)*(?:(\\w+)@)?([\\w\\-\\.]+)\\s',
-        r'scp\\s+.*?(?:(\\w+)@)?(\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3})',
-        r'rsync\\s+.*?(?:(\\w+)@)?(\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3})',
-    ]
-
-    for pattern in ssh_patterns:
-        match = re.search(pattern, command)
-        if match:
-            target = match.group(2)
-
-            # IP 주소 검증
-            if re.match(r'^\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}\\.\\d{1,3}$', target):
-                if target not in allowed_ips:
-                    deny(f"허용되지 않은 서버 IP: {target}\\n\\n허용된 IP:\\n" +
-                         "\\n".join(f"  - {ip}" for ip in allowed_ips) +
-                         "\\n\\n서버 목록 업데이트: we ssot sync")
-            # 호스트명 검증
-            elif target not in allowed_hostnames:
-                if not any(h in target for h in allowed_hostnames):
-                    deny(f"허용되지 않은 서버: {target}\\n\\n허용된 호스트: {', '.join(allowed_hostnames)}")
+    targets = [match.group('ip') or match.group('host')
+               for match in SSH_TARGET_PATTERN.finditer(command)]
+    file_copy = FILE_COPY_PATTERN.search(command)
+    if file_copy:
+        targets += IPV4_SEARCH_PATTERN.findall(command, file_copy.end())
+
+    for target in targets:
+        # IP 주소 검증
+        if IPV4_PATTERN.match(target):
+            if target not in allowed_ips:
+                deny(f"허용되지 않은 서버 IP: {target}\\n\\n허용된 IP:\\n" +
+                     "\\n".join(f"  - {ip}" for ip in sorted(allowed_ips)) +
+                     "\\n\\n서버 목록 업데이트: we ssot sync")
+        # 호스트명 검증
+        elif target not in allowed_hostnames:
+            if not any(h in target for h in allowed_hostnames):
+                deny(f"허용되지 않은 서버: {target}\\n\\n허용된 호스트: {', '.join(sorted(allowed_hostnames))}")
 
 def check_forbidden_commands(command: str):
     """금지 명령어 패턴 체크"""
     command_lower = command.lower()
 
-    for pattern, message in FORBIDDEN_PATTERNS:
-        if re.search(pattern, command_lower):
-            deny(f"🚫 {message}")
+    for pattern, reason, reason_json in FORBIDDEN_RULES:
+        if pattern.search(command_lower):
+            deny(reason, reason_json)
 
 def check_allowed_commands(command: str) -> bool:
     """허용 명령어 패턴 체크 (허용되면 True)"""
     for pattern in ALLOWED_PATTERNS:
-        if re.search(pattern, command, re.IGNORECASE):
+        if pattern.search(command):
             return True
     return False
 
@@ -333,14 +346,10 @@ def check_project_isolation(command: str):
     if not current_project:
         return
 
-    container_ops = ['rm', 'stop', 'restart', 'kill']
-    for op in container_ops:
-        pattern = rf'(podman|docker)\\s+{op}\\s+(\\S+)'
-        match = re.search(pattern, command)
-        if match:
-            container_name = match.group(2)
-            if current_project not in container_name and 'codeb' in container_name.lower():
-                deny(f"다른 프로젝트({container_name})의 컨테이너 조작 금지\\n\\n현재 프로젝트: {current_project}")
+    for match in CONTAINER_OP_PATTERN.finditer(command):
+        container_name = match.group(1)
+        if current_project not in container_name and 'codeb' in container_name.lower():
+            deny(f"다른 프로젝트({container_name})의 컨테이너 조작 금지\\n\\n현재 프로젝트: {current_project}")
 
 # ============================================================================
 # 메인
@@ -349,12 +358,13 @@ def check_project_isolation(command: str):
 def main():
     # stdin에서 hook input 읽기
     try:
-        input_data = sys.stdin.read()
+        # bytes 그대로 파싱 (텍스트 디코딩 단계 생략)
+        input_data = sys.stdin.buffer.read()
         if input_data.strip():
             hook_input = json.loads(input_data)
         else:
             hook_input = {}
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, UnicodeDecodeError):
         hook_input = {}
 
     # Bash 도구의 command 파라미터 추출
@@ -368,8 +378,9 @@ def main():
     if check_allowed_commands(command):
         allow()
 
-    # 2. SSH 대상 서버 검증
-    check_ssh_target(command)
+    # 2. SSH 대상 서버 검증 (ssh/scp/rsync 가 포함된 명령만 SSOT 캐시 로드)
+    if any(token in command for token in SSH_COMMAND_TOKENS):
+        check_ssh_target(command)
 
     # 3. 금지 명령어 체크
     check_forbidden_commands(command)